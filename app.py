@@ -1,26 +1,74 @@
+from app.warmup import start_warmup
 import gradio as gr
 import os
+import time
 from dotenv import load_dotenv
-from app.main import generate_answer_with_context
+from fastapi.concurrency import run_in_threadpool
+from fastapi import HTTPException
+from app.main import admission, build_query_response, healthz, readyz, metrics
+from app.coalescing import get_flight, normalize_query
+from app.conversation import retrieve_for_turn
+from app.llm import LLMUnavailableError, get_llm_service, remaining_deadline
+from app.extractive import extractive_answer
 
 load_dotenv()
 
-async def ask_question_direct(message, top_k, model):
-    if not message.strip():
-        return "Please enter a question."
-    
-    try:
-        result = await generate_answer_with_context(message, int(top_k), model)
-        answer = result.answer
-        
-        if result.total_sources > 0:
-            answer += f"\n\n**Sources ({result.total_sources}):**\n"
-            for i, src in enumerate(result.sources, 1):
-                answer += f"{i}. [r/{src.subreddit}]({src.url}) (score: {src.score})\n"
+# Gradio runs one event at a time per handler by default; let chats proceed side by side
+GRADIO_CONCURRENCY = int(os.getenv("GRADIO_CONCURRENCY", "16"))
+
+chat_flight = get_flight("chat")
+
+def format_sources(result):
+    if result.total_sources == 0:
+        return ""
+    text = f"\n\n**Sources ({result.total_sources}):**\n"
+    for i, src in enumerate(result.sources, 1):
+        text += f"{i}. [r/{src.subreddit}]({src.url}) (score: {src.score})\n"
+    return text
+
+async def stream_answer(message, top_k, model, previous=None):
+    """
+    Yield (partial answer, retrieval cache) while the answer streams in.
+    Blocking retrieval and provider calls run in the threadpool shared with the API,
+    and each turn holds an LLM slot from the same admission gate as /ask.
+    """
+    async with admission.llm_slot(model) as degraded:
+        # Query enhancement and the wait for the answer share one LLM_DEADLINE_SECONDS budget
+        started = time.monotonic()
+        docs, cache = await run_in_threadpool(retrieve_for_turn, message, previous, int(top_k), model,
+                                              enhance=not degraded)
+        llm_service = get_llm_service(model)
         
-        return answer
-    except Exception as e:
-        return f"Sorry, I encountered an error: {str(e)}. Please try again."
+        chunks = llm_service.stream_response(message, docs, remaining_deadline(started))
+        answer = ""
+        failure = None
+        try:
+            while True:
+                chunk = await run_in_threadpool(next, chunks, None)
+                if chunk is None:
+                    break
+                answer += chunk
+                yield answer, cache
+        except LLMUnavailableError as e:
+            failure = e
+    
+    if failure is not None:
+        # Nothing was streamed yet: answer from the retrieved threads, after releasing the slot
+        print(f"LLM streaming unavailable ({str(failure)}), answering extractively")
+        answer, used_doc_ids = await run_in_threadpool(extractive_answer, message, docs)
+        result = build_query_response(message, answer, docs, used_doc_ids, mode="extractive_fallback")
+        yield answer + format_sources(result), cache
+        return
+    
+    result = build_query_response(message, answer, docs, llm_service.extract_used_sources(answer, docs))
+    yield answer + format_sources(result), cache
+
+def chat_key(message, top_k, model, previous):
+    """Turns coalesce only when they would retrieve from the same previous-turn cache."""
+    previous_key = None
+    if previous:
+        previous_key = (tuple(doc["id"] for doc in previous["docs"]), tuple(previous["query_embedding"]))
+    return (normalize_query(message), int(top_k), model, previous_key)
 
 # Minimal CSS for dark theme
 css = """
@@ -36,27 +84,37 @@ footer {
 }
 """
 
-def handle_message(user_message, chat_history, state):
-    """Handle user message and get bot response"""
+async def handle_message(user_message, chat_history, state):
+    """Handle user message and stream the bot response"""
     if not user_message.strip():
-        return chat_history, state, ""
+        yield chat_history, state, ""
+        return
     
     # Add user message to chat
     chat_history.append([user_message, None])
+    yield chat_history, state, ""
     
     # Get settings from state
     top_k_val = state.get("top_k", 5)
     model_val = state.get("model", "grok")
     
-    # Get bot response
-    import asyncio
+    # Stream bot response, keeping this turn's documents for follow-up questions
     try:
-        bot_response = asyncio.run(ask_question_direct(user_message, top_k_val, model_val))
-        chat_history[-1][1] = bot_response
+        previous = state.get("retrieval")
+        key = chat_key(user_message, top_k_val, model_val, previous)
+        # Identical questions asked at the same time share one stream
+        chunks = chat_flight.stream(key, lambda: stream_answer(user_message, top_k_val, model_val, previous))
+        async for partial, cache in chunks:
+            chat_history[-1][1] = partial
+            state["retrieval"] = cache
+            yield chat_history, state, ""
+    except HTTPException as e:
+        # Admission rejected the turn: the provider is saturated
+        chat_history[-1][1] = e.detail
+        yield chat_history, state, ""
     except Exception as e:
-        chat_history[-1][1] = f"Sorry, I encountered an error: {str(e)}"
-    
-    return chat_history, state, ""
+        chat_history[-1][1] = f"Sorry, I encountered an error: {str(e)}. Please try again."
+        yield chat_history, state, ""
 
 def update_settings(model, sources, state):
     """Update settings in state"""
@@ -64,9 +122,10 @@ def update_settings(model, sources, state):
     state["top_k"] = sources
     return state
 
-def clear_chat():
-    """Clear the chat history"""
-    return []
+def clear_chat(state):
+    """Clear the chat history and the cached retrieval for follow-ups"""
+    state.pop("retrieval", None)
+    return [], state
 
 def set_prompt(prompt_text):
     """Set a suggested prompt"""
@@ -159,7 +218,7 @@ with gr.Blocks(title="Reddit RAG Assistant", theme=gr.themes.Soft(primary_hue="b
     )
     
     # Clear chat
-    clear_btn.click(clear_chat, outputs=[chatbot])
+    clear_btn.click(clear_chat, inputs=[state], outputs=[chatbot, state])
     
     # Suggested prompts
     prompt1.click(set_prompt, outputs=[user_input]).then(
@@ -175,10 +234,19 @@ with gr.Blocks(title="Reddit RAG Assistant", theme=gr.themes.Soft(primary_hue="b
         lambda: "What are the current trending discussions?", outputs=[user_input]
     )
 
+demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY)
+
+def create_server():
+    """Serve the chat UI at / next to the /healthz, /readyz and /metrics endpoints."""
+    from fastapi import FastAPI
+    server = FastAPI()
+    # Load the embedding model and open the collection before the first chat arrives
+    server.add_event_handler("startup", start_warmup)
+    server.add_api_route("/healthz", healthz, methods=["GET"])
+    server.add_api_route("/readyz", readyz, methods=["GET"])
+    server.add_api_route("/metrics", metrics, methods=["GET"])
+    return gr.mount_gradio_app(server, demo, path="/", show_error=True)
+
 if __name__ == "__main__":
-    demo.launch(
-        server_name="0.0.0.0",
-        server_port=7860,
-        share=False,
-        show_error=True
-    )
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(create_server(), host="0.0.0.0", port=7860)
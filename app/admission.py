@@ -0,0 +1,172 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, Request
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+ADMISSION_MAX_WAITING = int(os.getenv("ADMISSION_MAX_WAITING", "16"))
+ADMISSION_WAIT_TIMEOUT = float(os.getenv("ADMISSION_WAIT_TIMEOUT", "10"))
+ADMISSION_DEGRADED_MODE = os.getenv("ADMISSION_DEGRADED_MODE", "true").lower() == "true"
+
+_MAX_TRACKED_CLIENTS = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        """Take one token; returns 0 on success or the seconds until one is available."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """Per-client token buckets. Only touched from the event loop, so no locking."""
+
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.buckets = {}
+
+    def check(self, client_id):
+        if self.rate <= 0:
+            return
+        bucket = self.buckets.get(client_id)
+        if bucket is None:
+            if len(self.buckets) >= _MAX_TRACKED_CLIENTS:
+                self._prune()
+            bucket = self.buckets[client_id] = TokenBucket(self.rate, self.burst)
+        wait = bucket.try_take()
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded. Please slow down.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))}
+            )
+
+    def _prune(self):
+        # Clients whose bucket has refilled completely carry no state worth keeping
+        now = time.monotonic()
+        for client_id in [c for c, b in self.buckets.items() if b.is_full(now)]:
+            del self.buckets[client_id]
+
+
+class ProviderGate:
+    """
+    Caps concurrent LLM work for one provider. Requests beyond the cap wait in a
+    bounded queue up to a deadline; when the queue is full they are rejected at once.
+    """
+
+    def __init__(self, name, concurrency, max_waiting=ADMISSION_MAX_WAITING, wait_timeout=ADMISSION_WAIT_TIMEOUT):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.avg_seconds = 2.0  # EWMA of slot hold time, seeds Retry-After estimates
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def saturated(self):
+        return self.in_flight >= self.concurrency or self.waiting > 0
+
+    def retry_after(self):
+        backlog = (self.waiting + 1) / max(self.concurrency, 1)
+        return max(1, math.ceil(self.avg_seconds * backlog))
+
+    def _reject(self, reason):
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service is busy ({self.name}: {reason}). Please retry shortly.",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        if not self._semaphore.locked():
+            # A slot is free; acquire() returns without suspending
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_waiting:
+                self._reject("queue full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue deadline exceeded")
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * (time.monotonic() - start)
+
+
+class AdmissionController:
+    def __init__(self, degraded_mode=ADMISSION_DEGRADED_MODE):
+        self.rate_limiter = RateLimiter()
+        self.degraded_mode = degraded_mode
+        self.gates = {}
+
+    def gate(self, model):
+        provider = "claude" if model.startswith("claude") else model.split("-")[0]
+        if provider not in self.gates:
+            concurrency = int(os.getenv(f"LLM_CONCURRENCY_{provider.upper()}", LLM_CONCURRENCY))
+            self.gates[provider] = ProviderGate(provider, concurrency)
+        return self.gates[provider]
+
+    def check_rate_limit(self, request: Request):
+        self.rate_limiter.check(client_id(request))
+
+    @asynccontextmanager
+    async def llm_slot(self, model):
+        """
+        Hold an LLM slot for the provider while the body runs.
+        Yields True when the service is saturated and the caller should take the
+        degraded path (no query enhancement).
+        """
+        gate = self.gate(model)
+        degraded = self.degraded_mode and gate.saturated()
+        async with gate.slot():
+            yield degraded
+
+    def stats(self):
+        return {
+            name: {"concurrency": gate.concurrency, "in_flight": gate.in_flight, "waiting": gate.waiting}
+            for name, gate in self.gates.items()
+        }
+
+
+def client_id(request: Request):
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from app.vector_store import CHROMA_DB_DIR, CHROMA_HOST, CHROMA_PORT, file_lock
+
+CHROMA_SERVER_START_TIMEOUT = float(os.getenv("CHROMA_SERVER_START_TIMEOUT", "30"))
+
+
+def server_is_up(host=CHROMA_HOST, port=CHROMA_PORT):
+    """Return True if a Chroma server answers its heartbeat endpoint."""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/api/v1/heartbeat", timeout=1) as resp:
+            return resp.status == 200
+    except Exception:
+        return False
+
+
+def start_chroma_server(path=CHROMA_DB_DIR, host=CHROMA_HOST, port=CHROMA_PORT, timeout=CHROMA_SERVER_START_TIMEOUT):
+    """
+    Launch a local Chroma server as a detached process and wait for its heartbeat.
+    Returns the Popen handle.
+    """
+    env = dict(os.environ, CHROMA_DB_DIR=path, CHROMA_HOST=host, CHROMA_PORT=str(port))
+    process = subprocess.Popen([sys.executable, "-m", "app.chroma_server"], env=env, start_new_session=True)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server_is_up(host, port):
+            return process
+        if process.poll() is not None:
+            raise RuntimeError(f"Chroma server exited with code {process.returncode} during startup")
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Chroma server did not become ready on {host}:{port} within {timeout}s")
+
+
+def ensure_chroma_server(path=CHROMA_DB_DIR, host=CHROMA_HOST, port=CHROMA_PORT):
+    """Start the local server unless one is already running; safe to call from every worker."""
+    if server_is_up(host, port):
+        return
+    # Only one worker launches the server; the rest find it up once they get the lock
+    with file_lock(os.path.join(path, ".server.lock")):
+        if not server_is_up(host, port):
+            print(f"[ChromaDB] Starting local server on {host}:{port} for {os.path.abspath(path)}")
+            start_chroma_server(path, host, port)
+
+
+def main():
+    """Run a Chroma server in the foreground over the local persist directory."""
+    import uvicorn
+
+    abs_path = os.path.abspath(CHROMA_DB_DIR)
+    os.makedirs(abs_path, exist_ok=True)
+    os.environ["IS_PERSISTENT"] = "True"
+    os.environ["PERSIST_DIRECTORY"] = abs_path
+    print(f"[ChromaDB] Serving {abs_path} on http://{CHROMA_HOST}:{CHROMA_PORT}")
+    uvicorn.run("chromadb.app:app", host=CHROMA_HOST, port=CHROMA_PORT, workers=1, timeout_keep_alive=30)
+
+
+if __name__ == "__main__":
+    main()
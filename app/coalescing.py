@@ -0,0 +1,104 @@
+import asyncio
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, used in coalescing keys."""
+    return " ".join(query.lower().split())
+
+
+class _Broadcast:
+    """Chunks produced by one streaming computation, replayable by late subscribers."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def publish(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one in-flight computation.
+    The computation runs as its own task, so a caller going away does not
+    cancel it for everyone else; once it finishes the key is forgotten and
+    the next call starts fresh, so no result is ever served stale.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._streams = {}
+
+    async def do(self, key, fn):
+        """Await fn() once per key among concurrent callers and share its result."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def stream(self, key, agen_fn):
+        """Iterate agen_fn() once per key; every subscriber receives all chunks in order."""
+        broadcast = self._streams.get(key)
+        if broadcast is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            broadcast = self._streams[key] = _Broadcast()
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, agen_fn))
+
+        index = 0
+        while True:
+            if index < len(broadcast.chunks):
+                yield broadcast.chunks[index]
+                index += 1
+            elif broadcast.done:
+                if broadcast.error is not None:
+                    raise broadcast.error
+                return
+            else:
+                await broadcast.changed.wait()
+
+    async def _pump(self, key, broadcast, agen_fn):
+        try:
+            async for chunk in agen_fn():
+                broadcast.chunks.append(chunk)
+                broadcast.publish()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            self._streams.pop(key, None)
+            broadcast.publish()
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+
+_flights = {}
+
+
+def get_flight(name):
+    """Return the process-wide SingleFlight registered under name."""
+    if name not in _flights:
+        _flights[name] = SingleFlight(name)
+    return _flights[name]
+
+
+def coalescing_stats():
+    return {name: flight.stats() for name, flight in _flights.items()}
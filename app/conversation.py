@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+
+from app.diversity import diversify_documents
+from app.search import retrieve_documents, search_similar_documents
+from app.vector_store import get_embedding_function, normalize_embeddings
+
+FOLLOWUP_SIMILARITY = float(os.getenv("FOLLOWUP_SIMILARITY", "0.5"))
+# Weight of the conversation so far when blending it into the new turn's query embedding
+FOLLOWUP_CONTEXT_WEIGHT = float(os.getenv("FOLLOWUP_CONTEXT_WEIGHT", "0.5"))
+
+
+def is_followup(previous, query_embedding, threshold=FOLLOWUP_SIMILARITY):
+    """A turn is a close follow-up when its embedding stays near the conversation so far."""
+    if not previous or previous.get("query_embedding") is None or not previous.get("docs"):
+        return False
+    similarity = float(normalize_embeddings(previous["query_embedding"]) @ normalize_embeddings(query_embedding))
+    return similarity >= threshold
+
+
+def blend_with_context(query_embedding, previous, weight=FOLLOWUP_CONTEXT_WEIGHT):
+    """
+    Mix the previous turns into the query embedding, so short follow-ups that only
+    refer back ("why?", "what about for beginners?") still search the same topic.
+    """
+    blended = normalize_embeddings(query_embedding) + weight * normalize_embeddings(previous["query_embedding"])
+    return normalize_embeddings(blended)
+
+
+def rerank_documents(query_embedding, docs, top_k, mmr_lambda=None):
+    """Deduplicate docs by id and order them by cosine similarity to the query (or MMR)."""
+    unique = {}
+    for doc in docs:
+        if doc.get("embedding") is not None and doc["id"] not in unique:
+            unique[doc["id"]] = doc
+    docs = list(unique.values())
+    if not docs:
+        return []
+    if mmr_lambda is not None:
+        return diversify_documents(query_embedding, docs, top_k, mmr_lambda)
+
+    similarities = normalize_embeddings([doc["embedding"] for doc in docs]) @ normalize_embeddings(query_embedding)
+    return [docs[i] for i in np.argsort(-similarities)[:top_k]]
+
+
+def retrieve_for_turn(query, previous=None, top_k=5, model="claude", mmr_lambda=None, enhance=True):
+    """
+    Retrieve documents for one chat turn, reusing the previous turn when there is one.
+    The query embedding is blended with the conversation so far, and the cached
+    documents are merged with a fresh search on that blend and re-ranked against it.
+    Close follow-ups also skip query enhancement. Returns (docs, cache), where cache
+    is what the caller should keep for the next turn.
+    Pass enhance=False to skip query enhancement on new topics too (degraded mode).
+    """
+    query_embedding = get_embedding_function()([query])[0]
+
+    if not previous or previous.get("query_embedding") is None or not previous.get("docs"):
+        docs = retrieve_documents(query, top_k=top_k, model=model, mmr_lambda=mmr_lambda,
+                                  include_embeddings=True, query_embedding=query_embedding, enhance=enhance)
+        cache = {"query_embedding": list(map(float, query_embedding)), "docs": docs}
+        return docs, cache
+
+    context_embedding = blend_with_context(query_embedding, previous)
+    if is_followup(previous, query_embedding):
+        fresh = search_similar_documents(query, top_k=top_k, include_embeddings=True,
+                                         query_embedding=context_embedding)
+    else:
+        fresh = retrieve_documents(query, top_k=top_k, model=model, include_embeddings=True,
+                                   query_embedding=context_embedding, enhance=enhance)
+    docs = rerank_documents(context_embedding, previous["docs"] + fresh, top_k, mmr_lambda)
+
+    # The blend carries the topic forward, decaying older turns
+    cache = {"query_embedding": list(map(float, context_embedding)), "docs": docs}
+    return docs, cache
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+
+from app.vector_store import normalize_embeddings
+
+MMR_FETCH_MULTIPLIER = int(os.getenv("MMR_FETCH_MULTIPLIER", "4"))
+MMR_MAX_CANDIDATES = int(os.getenv("MMR_MAX_CANDIDATES", "100"))
+
+
+def mmr_fetch_k(top_k):
+    """Number of candidates to over-fetch before diversity selection."""
+    return max(top_k, min(top_k * MMR_FETCH_MULTIPLIER, MMR_MAX_CANDIDATES))
+
+
+def mmr_select(query_embedding, candidate_embeddings, k, lambda_mult=0.5):
+    """
+    Maximal Marginal Relevance selection.
+    Picks k candidate indices, trading relevance to the query (lambda_mult=1.0)
+    against dissimilarity to what has already been picked (lambda_mult=0.0).
+    All pairwise similarities are computed up front in one matrix product, so
+    each selection step is a single vector update.
+    """
+    candidates = normalize_embeddings(candidate_embeddings)
+    if candidates.ndim != 2 or len(candidates) == 0 or k <= 0:
+        return []
+    k = min(k, len(candidates))
+
+    relevance = candidates @ normalize_embeddings(query_embedding)
+    similarity = candidates @ candidates.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(len(candidates), dtype=bool)
+    available[first] = False
+    max_similarity = similarity[first].copy()
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        index = int(np.argmax(scores))
+        selected.append(index)
+        available[index] = False
+        np.maximum(max_similarity, similarity[index], out=max_similarity)
+    return selected
+
+
+def diversify_documents(query_embedding, docs, k, lambda_mult=0.5):
+    """Reorder and trim docs (each carrying an 'embedding') with MMR."""
+    docs = [doc for doc in docs if doc.get("embedding") is not None]
+    if not docs:
+        return []
+    indices = mmr_select(query_embedding, [doc["embedding"] for doc in docs], k, lambda_mult)
+    return [docs[i] for i in indices]
+
+
+def benchmark(n_candidates=300, dim=384, k=10, runs=50):
+    """Time mmr_select on random embeddings; returns (median_ms, p95_ms)."""
+    import time
+
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=dim).astype(np.float32)
+    candidates = rng.normal(size=(n_candidates, dim)).astype(np.float32)
+
+    mmr_select(query, candidates, k)  # warm up BLAS
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        mmr_select(query, candidates, k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings)), float(np.percentile(timings, 95))
+
+
+def main():
+    import sys
+
+    dim = int(sys.argv[1]) if len(sys.argv) > 1 else 384
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"MMR selection benchmark (dim={dim}, k={k})")
+    for n_candidates in (50, 100, 300, 500):
+        median_ms, p95_ms = benchmark(n_candidates, dim, k)
+        print(f"  candidates={n_candidates:>4}: median {median_ms:.3f} ms, p95 {p95_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import re
+
+from app.diversity import mmr_select
+from app.vector_store import get_embedding_function
+
+EXTRACTIVE_SENTENCES = int(os.getenv("EXTRACTIVE_SENTENCES", "4"))
+EXTRACTIVE_MAX_CANDIDATES = int(os.getenv("EXTRACTIVE_MAX_CANDIDATES", "150"))
+EXTRACTIVE_LAMBDA = float(os.getenv("EXTRACTIVE_LAMBDA", "0.7"))
+
+# Section labels written by ingestion.structure_post_with_comments
+_LABEL = re.compile(r"^(Title|Post|Top Comment \d+):\s*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text, min_words=4):
+    """
+    Split an ingested document into sentences, dropping section labels, stubs
+    and questions (titles usually restate the query rather than answer it).
+    """
+    sentences = []
+    for block in text.split("\n"):
+        block = _LABEL.sub("", block.strip())
+        if not block or block == "[No text content]":
+            continue
+        for sentence in _SENTENCE_END.split(block):
+            sentence = sentence.strip()
+            if len(sentence.split()) >= min_words and not sentence.endswith("?"):
+                sentences.append(sentence)
+    return sentences
+
+
+def extractive_answer(query, docs, max_sentences=EXTRACTIVE_SENTENCES):
+    """
+    Answer from the retrieved documents alone: embed the query and every candidate
+    sentence in one batch, then pick the best non-redundant sentences with MMR.
+    Returns (answer, used_doc_ids) like LLMService.generate.
+    """
+    candidates = []
+    for doc in docs:
+        for sentence in split_sentences(doc.get("text", "")):
+            candidates.append((sentence, doc))
+    # Documents arrive best-first, so truncation keeps the most relevant threads
+    candidates = candidates[:EXTRACTIVE_MAX_CANDIDATES]
+    if not candidates:
+        return ("I don't have enough context to answer this question.", [])
+
+    embeddings = get_embedding_function()([query] + [sentence for sentence, _ in candidates])
+    selected = mmr_select(embeddings[0], embeddings[1:], max_sentences, EXTRACTIVE_LAMBDA)
+
+    lines = []
+    used_doc_ids = []
+    for index in selected:
+        sentence, doc = candidates[index]
+        subreddit = doc.get("metadata", {}).get("subreddit")
+        lines.append(f"- {sentence}" + (f" (r/{subreddit})" if subreddit else ""))
+        if doc["id"] not in used_doc_ids:
+            used_doc_ids.append(doc["id"])
+
+    answer = "Here are the most relevant points from Reddit discussions:\n\n" + "\n".join(lines)
+    return (answer, used_doc_ids)
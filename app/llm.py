@@ -1,7 +1,24 @@
 import os
-from anthropic import Anthropic
-from openai import OpenAI
-from typing import List, Dict, Any
+import threading
+import time
+from typing import TYPE_CHECKING, Iterator, List, Dict, Any
+
+# Provider SDKs are imported when a client is created, keeping app startup light
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+    from openai import OpenAI
+
+# Provider requests that take longer than this are abandoned; callers answer extractively
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "15"))
+
+class LLMUnavailableError(Exception):
+    """The provider failed or returned nothing; callers can fall back to an extractive answer."""
+
+
+def remaining_deadline(started: float) -> float:
+    """Seconds left of LLM_DEADLINE_SECONDS for a request whose LLM work began at started (time.monotonic())."""
+    return LLM_DEADLINE_SECONDS - (time.monotonic() - started)
+
 
 class LLMService:
     def __init__(self, model: str = "claude"):
@@ -20,8 +37,9 @@ class LLMService:
             self.client = self._create_openai_client()
             self.model_name = "grok-2-1212"
     
-    def _create_anthropic_client(self) -> Anthropic:
+    def _create_anthropic_client(self) -> "Anthropic":
         """Create Anthropic client with proxy error handling"""
+        from anthropic import Anthropic
         try:
             return Anthropic(api_key=self.api_key)
         except TypeError as e:
@@ -29,8 +47,9 @@ class LLMService:
                 return Anthropic(api_key=self.api_key)
             raise e
     
-    def _create_openai_client(self) -> OpenAI:
+    def _create_openai_client(self) -> "OpenAI":
         """Create OpenAI client with proxy error handling"""
+        from openai import OpenAI
         try:
             return OpenAI(api_key=self.api_key, base_url="https://api.x.ai/v1")
         except TypeError as e:
@@ -43,42 +62,109 @@ class LLMService:
                 return OpenAI(**filtered_kwargs)
             raise e
     
-    def generate_response(self, query: str, context_docs: List[Dict[str, Any]]) -> tuple[str, List[str]]:
+    def _deadline_client(self, timeout: float = None):
+        """
+        The client with the request deadline (or what is left of it) applied and SDK retries
+        off, so the calling thread gives up at the deadline instead of running on after the
+        caller stops waiting.
+        """
+        if timeout is None:
+            timeout = LLM_DEADLINE_SECONDS
+        if timeout <= 0:
+            raise LLMUnavailableError("Deadline exceeded before calling the provider")
+        return self.client.with_options(timeout=timeout, max_retries=0)
+    
+    def _complete(self, prompt: str, timeout: float = None) -> str:
+        client = self._deadline_client(timeout)
+        if self.model.startswith("claude"):
+            response = client.messages.create(
+                model=self.model_name,
+                max_tokens=500,
+                temperature=0.7,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return response.content[0].text
+        response = client.chat.completions.create(
+            model=self.model_name,
+            max_tokens=500,
+            temperature=0.7,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content
+    
+    def generate(self, query: str, context_docs: List[Dict[str, Any]], timeout: float = None) -> tuple[str, List[str]]:
+        """
+        Return (answer, used_doc_ids); raises LLMUnavailableError when the provider fails or
+        times out. timeout defaults to LLM_DEADLINE_SECONDS.
+        """
         if not context_docs:
             return ("I don't have enough context to answer this question.", [])
         
         if not query or not query.strip():
             return ("Please provide a valid question.", [])
         
+        context_text = self._build_context_with_refs(context_docs)
+        prompt = self._create_prompt_with_refs(query, context_text)
         try:
-            context_text = self._build_context_with_refs(context_docs)
-            prompt = self._create_prompt_with_refs(query, context_text)
-            
+            answer = self._complete(prompt, timeout)
+        except Exception as e:
+            raise LLMUnavailableError(str(e)) from e
+        
+        if not answer:
+            raise LLMUnavailableError("Empty response from provider")
+        return (answer, self.extract_used_sources(answer, context_docs))
+    
+    def stream_response(self, query: str, context_docs: List[Dict[str, Any]], timeout: float = None) -> Iterator[str]:
+        """
+        Yield the answer in chunks as the provider produces them. Raises LLMUnavailableError
+        when the provider fails, times out or stays silent before the first chunk; a failure
+        after that just ends the stream.
+        """
+        if not context_docs:
+            yield "I don't have enough context to answer this question."
+            return
+        
+        if not query or not query.strip():
+            yield "Please provide a valid question."
+            return
+        
+        context_text = self._build_context_with_refs(context_docs)
+        prompt = self._create_prompt_with_refs(query, context_text)
+        produced = False
+        try:
+            # For streams the deadline bounds the wait for each chunk, including the first
+            client = self._deadline_client(timeout)
             if self.model.startswith("claude"):
-                response = self.client.messages.create(
+                with client.messages.stream(
                     model=self.model_name,
                     max_tokens=500,
                     temperature=0.7,
                     messages=[{"role": "user", "content": prompt}]
-                )
-                answer = response.content[0].text
+                ) as stream:
+                    for text in stream.text_stream:
+                        if text:
+                            produced = True
+                            yield text
             else:
-                response = self.client.chat.completions.create(
+                stream = client.chat.completions.create(
                     model=self.model_name,
                     max_tokens=500,
                     temperature=0.7,
-                    messages=[{"role": "user", "content": prompt}]
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True
                 )
-                answer = response.choices[0].message.content
-            
-            if not answer:
-                return ("Sorry, I couldn't generate a response. Please try again.", [])
-            
-            used_doc_ids = self._extract_used_sources(answer, context_docs)
-            return (answer, used_doc_ids)
-            
+                for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        produced = True
+                        yield text
         except Exception as e:
-            return ("Sorry, I'm having trouble processing your request. Please try again later.", [])
+            if not produced:
+                raise LLMUnavailableError(str(e)) from e
+            return
+        
+        if not produced:
+            raise LLMUnavailableError("Empty response from provider")
     
     def _build_context_with_refs(self, docs: List[Dict[str, Any]]) -> str:
         context_parts = []
@@ -105,7 +191,7 @@ Instructions:
 
 Answer:"""
     
-    def _extract_used_sources(self, answer: str, context_docs: List[Dict[str, Any]]) -> List[str]:
+    def extract_used_sources(self, answer: str, context_docs: List[Dict[str, Any]]) -> List[str]:
         used_doc_ids = []
         
         for doc in context_docs:
@@ -122,4 +208,16 @@ Answer:"""
         if not used_doc_ids and context_docs:
             used_doc_ids = [doc["id"] for doc in context_docs[:2]]
         
-        return used_doc_ids
\ No newline at end of file
+        return used_doc_ids
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_llm_service(model: str = "claude") -> LLMService:
+    """Return a process-wide LLMService per model so provider clients and their connections are reused."""
+    with _services_lock:
+        if model not in _services:
+            _services[model] = LLMService(model=model)
+        return _services[model]
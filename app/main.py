@@ -1,22 +1,58 @@
-from fastapi import FastAPI, HTTPException
+from app.warmup import start_warmup, is_live, is_ready, readiness
+import time
+from contextlib import nullcontext
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from app.models import SearchRequest, SearchResponse, SearchResult, QueryRequest, QueryResponse, Source
-from app.search import search_similar_documents, search_with_multiple_queries
-from app.llm import LLMService
-from app.query_processor import QueryProcessor
+from app.search import retrieve_documents, search_similar_documents
+from app.llm import LLMUnavailableError, get_llm_service, remaining_deadline
+from app.extractive import extractive_answer
+from app.admission import AdmissionController
+from app.coalescing import coalescing_stats, get_flight, normalize_query
+from app.vector_store import UnsafeWriteError, add_documents_to_collection, check_writes_allowed
 
 from dotenv import load_dotenv
 load_dotenv()
 
 app = FastAPI()
+admission = AdmissionController()
+search_flight = get_flight("search")
+ask_flight = get_flight("ask")
+
+@app.on_event("startup")
+async def warm_backend():
+    start_warmup()
 
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Reddit-Powered LLM API is running."}
 
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is serving and warmup is done or still retrying."""
+    if not is_live():
+        return JSONResponse(status_code=503, content={"status": "failed", "error": readiness()["error"]})
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: embedding model loaded, collection open and a dummy query served."""
+    return JSONResponse(status_code=200 if is_ready() else 503, content=readiness())
+
+@app.get("/metrics")
+def metrics():
+    return {"coalescing": coalescing_stats(), "admission": admission.stats()}
+
 @app.post("/search", response_model=SearchResponse)
 async def search_documents(request: SearchRequest):
     try:
-        docs = search_similar_documents(request.query, top_k=request.top_k)
+        # Identical concurrent searches share one Chroma query
+        key = (normalize_query(request.query), request.top_k, request.mmr_lambda)
+        docs = await search_flight.do(key, lambda: run_in_threadpool(
+            search_similar_documents, request.query, top_k=request.top_k, mmr_lambda=request.mmr_lambda
+        ))
         results = [
             SearchResult(
                 id=doc["id"],
@@ -34,55 +70,105 @@ async def search_documents(request: SearchRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
-async def generate_answer_with_context(query: str, top_k: int = 5, model: str = "claude") -> QueryResponse:
+def build_query_response(query: str, answer: str, docs, used_doc_ids, mode: str = "generate") -> QueryResponse:
+    sources = []
+    for doc in docs:
+        if doc["id"] in used_doc_ids:
+            metadata = doc.get("metadata", {})
+            sources.append(Source(
+                id=doc["id"],
+                subreddit=metadata.get("subreddit"),
+                url=metadata.get("url"),
+                score=metadata.get("score")
+            ))
+    
+    return QueryResponse(
+        answer=answer,
+        query=query,
+        sources=sources,
+        total_sources=len(sources),
+        mode=mode
+    )
+
+async def generate_answer_with_context(query: str, top_k: int = 5, model: str = "claude",
+                                      mmr_lambda: Optional[float] = None, enhance: bool = True,
+                                      mode: str = "generate", slot=None):
+    """
+    Answer a query from retrieved documents. slot, if given, is an admission slot
+    (AdmissionController.llm_slot) held only around the LLM work - query enhancement
+    and generation - and yields whether to degrade. Returns (QueryResponse, degraded).
+    """
     try:
-        query_processor = None
-        if model and model.startswith("claude"):
-            query_processor = QueryProcessor()
-        
-        if query_processor and query_processor.should_preprocess(query):
-            search_queries = query_processor.enhance_query(query)
-            docs = search_with_multiple_queries(search_queries, top_k=top_k)
-        else:
-            docs = search_similar_documents(query, top_k=top_k)
+        # Retrieval and generation are blocking calls; keep them off the event loop
+        if mode == "extractive":
+            # No LLM anywhere on this path, including query enhancement
+            docs = await run_in_threadpool(retrieve_documents, query, top_k, model, mmr_lambda, enhance=False)
+            answer, used_doc_ids = await run_in_threadpool(extractive_answer, query, docs)
+            return build_query_response(query, answer, docs, used_doc_ids, mode="extractive"), False
         
-        llm_service = LLMService(model=model)
-        answer, used_doc_ids = llm_service.generate_response(query, docs)
+        failure = None
+        async with slot or nullcontext(False) as degraded:
+            # Query enhancement and generation share one LLM_DEADLINE_SECONDS budget
+            started = time.monotonic()
+            docs = await run_in_threadpool(retrieve_documents, query, top_k, model, mmr_lambda,
+                                           enhance=enhance and not degraded)
+            llm_service = get_llm_service(model)
+            try:
+                # The provider request itself times out with the budget, so the worker
+                # thread is done before the slot is released
+                answer, used_doc_ids = await run_in_threadpool(llm_service.generate, query, docs,
+                                                               remaining_deadline(started))
+            except LLMUnavailableError as e:
+                failure = e
         
-        sources = []
-        for doc in docs:
-            if doc["id"] in used_doc_ids:
-                metadata = doc.get("metadata", {})
-                sources.append(Source(
-                    id=doc["id"],
-                    subreddit=metadata.get("subreddit"),
-                    url=metadata.get("url"),
-                    score=metadata.get("score")
-                ))
+        if failure is not None:
+            # CPU-only work; the provider slot is already free for other callers
+            print(f"LLM generation unavailable ({str(failure)}), answering extractively")
+            answer, used_doc_ids = await run_in_threadpool(extractive_answer, query, docs)
+            return build_query_response(query, answer, docs, used_doc_ids, mode="extractive_fallback"), degraded
         
-        return QueryResponse(
-            answer=answer,
-            query=query,
-            sources=sources,
-            total_sources=len(sources)
-        )
+        return build_query_response(query, answer, docs, used_doc_ids), degraded
+    except HTTPException:
+        # Admission rejections keep their 503 and Retry-After
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Configuration error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
 
 @app.post("/ask", response_model=QueryResponse)
-async def ask_question(request: QueryRequest):
-    return await generate_answer_with_context(request.query, request.top_k)
+async def ask_question(request: QueryRequest, http_request: Request, response: Response):
+    model = "claude"
+    # Rejections (429/503 with Retry-After) are raised before any work is done
+    admission.check_rate_limit(http_request)
+    
+    async def answer():
+        slot = None if request.mode == "extractive" else admission.llm_slot(model)
+        return await generate_answer_with_context(request.query, request.top_k, model,
+                                                  mmr_lambda=request.mmr_lambda, mode=request.mode, slot=slot)
+    
+    # Identical concurrent questions share one pipeline run and one LLM slot
+    key = (normalize_query(request.query), request.top_k, request.mmr_lambda, model, request.mode)
+    result, degraded = await ask_flight.do(key, answer)
+    if degraded:
+        response.headers["X-Degraded-Mode"] = "true"
+    return result.model_copy(update={"query": request.query})
 
 @app.get("/ingest/{subreddit}")
 async def ingest_subreddit(subreddit: str, post_limit: int = 20, comment_limit: int = 2):
     """Manual endpoint to ingest Reddit data"""
+    # Check before fetching from Reddit: this worker may not be allowed to write at all
+    try:
+        check_writes_allowed()
+    except UnsafeWriteError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
     try:
-        from app.ingestion import RedditIngester
-        ingester = RedditIngester()
-        result = ingester.ingest_subreddit(subreddit, post_limit=post_limit, comment_limit=comment_limit)
-        return {"status": "success", "message": f"Ingested data from r/{subreddit}", "result": result}
+        from app import ingestion
+        docs = await run_in_threadpool(ingestion.ingest_subreddit, subreddit,
+                                       post_limit=post_limit, comment_limit=comment_limit)
+        added = await run_in_threadpool(add_documents_to_collection, docs)
+        return {"status": "success", "message": f"Ingested data from r/{subreddit}", "result": {"added": added}}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
@@ -1,9 +1,10 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 class SearchRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=500, description="Search query")
     top_k: int = Field(default=5, ge=1, le=20, description="Number of results to return")
+    mmr_lambda: Optional[float] = Field(default=None, ge=0.0, le=1.0, description="Enable MMR diversity selection; 1.0 favours relevance, 0.0 favours diversity")
     
 class SearchResult(BaseModel):
     id: str
@@ -19,6 +20,8 @@ class SearchResponse(BaseModel):
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=500, description="User question")
     top_k: int = Field(default=5, ge=1, le=10, description="Number of documents to retrieve")
+    mmr_lambda: Optional[float] = Field(default=None, ge=0.0, le=1.0, description="Enable MMR diversity selection; 1.0 favours relevance, 0.0 favours diversity")
+    mode: Literal["generate", "extractive"] = Field(default="generate", description="Generate an answer with the LLM, or extract the best sentences without one")
 
 class Source(BaseModel):
     id: str
@@ -31,3 +34,4 @@ class QueryResponse(BaseModel):
     query: str
     sources: List[Source]
     total_sources: int
+    mode: str = Field(default="generate", description="How the answer was produced: generate, extractive or extractive_fallback")
@@ -1,6 +1,14 @@
 import os
-from anthropic import Anthropic
-from typing import List
+import threading
+from typing import TYPE_CHECKING, List
+
+from app.llm import LLM_DEADLINE_SECONDS
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+
+# Enhancement runs before generation and counts against the same LLM deadline, so keep it short
+QUERY_ENHANCE_TIMEOUT_SECONDS = min(float(os.getenv("QUERY_ENHANCE_TIMEOUT_SECONDS", "5")), LLM_DEADLINE_SECONDS)
 
 class QueryProcessor:
     def __init__(self, api_key: str = None, model: str = "claude-3-haiku-20240307"):
@@ -11,8 +19,9 @@ class QueryProcessor:
         self.client = self._create_client()
         self.model = model
     
-    def _create_client(self) -> Anthropic:
+    def _create_client(self) -> "Anthropic":
         """Create Anthropic client with proxy error handling"""
+        from anthropic import Anthropic
         try:
             return Anthropic(api_key=self.api_key)
         except TypeError as e:
@@ -46,7 +55,9 @@ Response:
 - bangalore cafe recommendations
 - good cafes bengaluru reviews"""
 
-            response = self.client.messages.create(
+            # No SDK retries: on a slow provider the original query alone is good enough
+            client = self.client.with_options(timeout=QUERY_ENHANCE_TIMEOUT_SECONDS, max_retries=0)
+            response = client.messages.create(
                 model=self.model,
                 max_tokens=200,
                 temperature=0.3,
@@ -86,4 +97,17 @@ Response:
         if len(query.split()) <= 2:
             return False
         
-        return True
\ No newline at end of file
+        return True
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def get_query_processor() -> QueryProcessor:
+    """Return a process-wide QueryProcessor so its Anthropic client is reused."""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = QueryProcessor()
+        return _processor
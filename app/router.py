@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from app.vector_store import CHROMA_DB_DIR, normalize_embeddings
+
+ROUTER_ENABLED = os.getenv("SUBREDDIT_ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_PATH = os.getenv("SUBREDDIT_ROUTER_PATH", os.path.join(CHROMA_DB_DIR, "subreddit_centroids.json"))
+ROUTER_TOP_SUBREDDITS = int(os.getenv("ROUTER_TOP_SUBREDDITS", "3"))
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.25"))
+ROUTER_MAX_CENTROIDS = int(os.getenv("ROUTER_MAX_CENTROIDS", "4"))
+ROUTER_SPLIT_SIMILARITY = float(os.getenv("ROUTER_SPLIT_SIMILARITY", "0.35"))
+
+
+class SubredditRouter:
+    """
+    Keeps a few centroid embeddings per subreddit so a query can be routed to
+    the communities it most likely belongs to before hitting the collection.
+    """
+
+    def __init__(self, path=ROUTER_PATH, max_centroids=ROUTER_MAX_CENTROIDS,
+                 split_similarity=ROUTER_SPLIT_SIMILARITY):
+        self.path = path
+        self.max_centroids = max_centroids
+        self.split_similarity = split_similarity
+        # subreddit -> {"sums": [[...], ...], "counts": [n, ...]}
+        self.centroids = {}
+        self._matrix = None
+        self._labels = []
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load centroids from disk if the file exists and changed since the last load."""
+        if not os.path.exists(self.path):
+            return self
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return self
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            with self._lock:
+                self.centroids = data.get("subreddits", {})
+                self._mtime = mtime
+                self._matrix = None
+        except Exception as e:
+            print(f"[Router] Failed to load centroids from {self.path}: {str(e)}")
+        return self
+
+    def save(self):
+        """Persist centroids atomically next to the ChromaDB data."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump({"subreddits": self.centroids}, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+
+    def update(self, subreddits, embeddings):
+        """
+        Fold a batch of document embeddings into the running centroids.
+        Each vector joins its subreddit's nearest centroid, or starts a new one
+        when it is far from all of them and the subreddit has room left.
+        """
+        if not len(subreddits):
+            return
+        vectors = normalize_embeddings(embeddings)
+        with self._lock:
+            for subreddit, vector in zip(subreddits, vectors):
+                entry = self.centroids.setdefault(subreddit, {"sums": [], "counts": []})
+                if entry["sums"]:
+                    sums = np.asarray(entry["sums"], dtype=np.float32)
+                    similarities = normalize_embeddings(sums) @ vector
+                    best = int(np.argmax(similarities))
+                    if similarities[best] < self.split_similarity and len(entry["sums"]) < self.max_centroids:
+                        best = None
+                else:
+                    best = None
+
+                if best is None:
+                    entry["sums"].append(vector.tolist())
+                    entry["counts"].append(1)
+                else:
+                    entry["sums"][best] = (sums[best] + vector).tolist()
+                    entry["counts"][best] += 1
+            self._matrix = None
+
+    def _build_matrix(self):
+        labels = []
+        rows = []
+        for subreddit, entry in self.centroids.items():
+            for centroid_sum in entry["sums"]:
+                labels.append(subreddit)
+                rows.append(centroid_sum)
+        self._labels = labels
+        self._matrix = normalize_embeddings(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    def route(self, query_embedding, top_n=ROUTER_TOP_SUBREDDITS, min_similarity=ROUTER_MIN_SIMILARITY):
+        """
+        Score the query against every centroid in one matrix product and return
+        the top_n subreddits, or None when a full search is the safer choice.
+        """
+        with self._lock:
+            if self._matrix is None:
+                self._build_matrix()
+            matrix, labels = self._matrix, self._labels
+
+        if len(set(labels)) <= top_n:
+            return None
+
+        similarities = matrix @ normalize_embeddings(query_embedding)
+        if float(similarities.max()) < min_similarity:
+            return None
+
+        subreddits = []
+        for index in np.argsort(-similarities):
+            if labels[index] not in subreddits:
+                subreddits.append(labels[index])
+            if len(subreddits) >= top_n:
+                break
+        return subreddits
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Return the process-wide router, reloading centroids if the file changed."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = SubredditRouter()
+    return _router.load()
+
+
+def rebuild_router(collection=None, batch_size=1000):
+    """Recompute all centroids from the documents already stored in a collection."""
+    from app.vector_store import get_or_create_collection
+
+    if collection is None:
+        collection = get_or_create_collection()
+
+    router = SubredditRouter()
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "metadatas"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        subreddits = [(m or {}).get("subreddit", "unknown") for m in batch["metadatas"]]
+        router.update(subreddits, batch["embeddings"])
+        offset += len(batch["ids"])
+    router.save()
+    return len(router.centroids)
+
+
+if __name__ == "__main__":
+    count = rebuild_router()
+    print(f"✅ Rebuilt centroids for {count} subreddits at {ROUTER_PATH}")
@@ -1,43 +1,77 @@
-from app.vector_store import get_chroma_client, get_or_create_collection
-from chromadb.utils import embedding_functions
-from typing import List, Dict, Any
-import os
+from app.vector_store import get_embedding_function, get_shared_collection
+from app.router import ROUTER_ENABLED, get_router
+from app.diversity import diversify_documents, mmr_fetch_k
+from app.query_processor import get_query_processor
+from typing import List, Dict, Any, Optional
 
-COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "reddit_docs")
 
+def _query_collection(collection, query_embedding, top_k, where=None, include_embeddings=False):
+    include = ["documents", "metadatas", "distances"]
+    if include_embeddings:
+        include.append("embeddings")
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=top_k,
+        where=where,
+        include=include
+    )
+    
+    # Handle empty results
+    if not results["ids"] or not results["ids"][0]:
+        return []
+    
+    docs = []
+    for i in range(len(results["ids"][0])):
+        docs.append({
+            "id": results["ids"][0][i],
+            "text": results["documents"][0][i],
+            "metadata": results["metadatas"][0][i],
+            "distance": results["distances"][0][i] if results.get("distances") else None
+        })
+        if include_embeddings:
+            docs[-1]["embedding"] = results["embeddings"][0][i]
+    return docs
 
-def search_similar_documents(query, top_k=5, collection=None, embedding_fn=None):
+
+def search_similar_documents(query, top_k=5, collection=None, embedding_fn=None, route=ROUTER_ENABLED,
+                             mmr_lambda=None, include_embeddings=False, query_embedding=None):
     """
     Search for documents most similar to the query in ChromaDB.
+    When routing is on, the search is restricted to the subreddits whose centroids
+    best match the query, falling back to the full collection when the router is
+    unsure or the routed search comes back short.
+    When mmr_lambda is set, extra candidates are fetched and the top_k are picked
+    with Maximal Marginal Relevance (1.0 = pure relevance, 0.0 = max diversity).
+    Pass query_embedding to skip re-embedding a query the caller already embedded.
     Returns a list of dicts with document text and metadata.
     """
     if not query or not query.strip():
         return []
     
     if collection is None:
-        client = get_chroma_client()
-        collection = get_or_create_collection(client, name=COLLECTION_NAME)
+        collection = get_shared_collection()
     if embedding_fn is None:
-        embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+        embedding_fn = get_embedding_function()
     
     try:
-        results = collection.query(
-            query_texts=[query],
-            n_results=top_k
-        )
-        
-        # Handle empty results
-        if not results["ids"] or not results["ids"][0]:
-            return []
+        if query_embedding is None:
+            query_embedding = embedding_fn([query])[0]
+        diversify = mmr_lambda is not None
+        n_results = mmr_fetch_k(top_k) if diversify else top_k
+        with_embeddings = diversify or include_embeddings
         
         docs = []
-        for i in range(len(results["ids"][0])):
-            docs.append({
-                "id": results["ids"][0][i],
-                "text": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "distance": results["distances"][0][i] if "distances" in results else None
-            })
+        subreddits = get_router().route(query_embedding) if route else None
+        if subreddits:
+            docs = _query_collection(collection, query_embedding, n_results,
+                                     where={"subreddit": {"$in": subreddits}},
+                                     include_embeddings=with_embeddings)
+        if len(docs) < top_k:
+            docs = _query_collection(collection, query_embedding, n_results,
+                                     include_embeddings=with_embeddings)
+        
+        if diversify:
+            docs = diversify_documents(query_embedding, docs, top_k, mmr_lambda)
         return docs
     except Exception as e:
         # Log error and return empty list instead of crashing
@@ -45,25 +79,32 @@ def search_similar_documents(query, top_k=5, collection=None, embedding_fn=None)
         return []
 
 
-def search_with_multiple_queries(queries: List[str], top_k=5) -> List[Dict[str, Any]]:
+def search_with_multiple_queries(queries: List[str], top_k=5, mmr_lambda=None,
+                                 include_embeddings=False, query_embedding=None) -> List[Dict[str, Any]]:
     """
     Search using multiple query variations and combine results.
-    Deduplicates and ranks by best distance scores.
+    Deduplicates and ranks by best distance scores, or by MMR against the
+    first query when mmr_lambda is set. query_embedding, if given, is the
+    embedding of queries[0] and saves embedding it again.
     """
     if not queries:
         return []
     
     all_docs = {}  # Use dict to deduplicate by ID
     
-    client = get_chroma_client()
-    collection = get_or_create_collection(client, name=COLLECTION_NAME)
+    collection = get_shared_collection()
+    
+    diversify = mmr_lambda is not None
+    n_results = mmr_fetch_k(top_k) if diversify else top_k
     
     # Search with each query variation
-    for query in queries:
+    for i, query in enumerate(queries):
         if not query or not query.strip():
             continue
         
-        docs = search_similar_documents(query, top_k=top_k, collection=collection)
+        docs = search_similar_documents(query, top_k=n_results, collection=collection,
+                                        include_embeddings=diversify or include_embeddings,
+                                        query_embedding=query_embedding if i == 0 else None)
         
         # Add to results, keeping best distance score for each document
         for doc in docs:
@@ -75,6 +116,25 @@ def search_with_multiple_queries(queries: List[str], top_k=5) -> List[Dict[str,
     combined_docs = list(all_docs.values())
     combined_docs.sort(key=lambda x: x["distance"] if x["distance"] is not None else float('inf'))
     
+    if diversify and combined_docs:
+        if query_embedding is None:
+            query_embedding = get_embedding_function()([queries[0]])[0]
+        return diversify_documents(query_embedding, combined_docs, top_k, mmr_lambda)
+    
     # Return top_k results
     return combined_docs[:top_k]
 
+
+def retrieve_documents(query: str, top_k: int = 5, model: str = "claude", mmr_lambda: Optional[float] = None,
+                       include_embeddings: bool = False, query_embedding=None, enhance: bool = True):
+    """Run the retrieval half of the pipeline: optional query enhancement, then vector search."""
+    query_processor = None
+    if enhance and model and model.startswith("claude"):
+        query_processor = get_query_processor()
+    
+    if query_processor and query_processor.should_preprocess(query):
+        search_queries = query_processor.enhance_query(query)
+        return search_with_multiple_queries(search_queries, top_k=top_k, mmr_lambda=mmr_lambda,
+                                            include_embeddings=include_embeddings, query_embedding=query_embedding)
+    return search_similar_documents(query, top_k=top_k, mmr_lambda=mmr_lambda,
+                                    include_embeddings=include_embeddings, query_embedding=query_embedding)
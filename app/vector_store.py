@@ -1,15 +1,158 @@
-from chromadb import Client
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-
+# chromadb is imported inside the functions below so importing this module stays cheap
+import numpy as np
 import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, writes are not serialized across processes
+    fcntl = None
 
 CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", "./chroma_db")
 COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "reddit_docs")
 
+# "embedded" opens the persist directory in-process; "http" talks to a Chroma server
+CHROMA_MODE = os.getenv("CHROMA_MODE", "embedded").lower()
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8001"))
+CHROMA_HTTP_POOL_SIZE = int(os.getenv("CHROMA_HTTP_POOL_SIZE", "32"))
+CHROMA_AUTOSTART = os.getenv("CHROMA_AUTOSTART", "false").lower() == "true"
+# Without fcntl (Windows) writer ownership can't be enforced; this opts the process in instead
+CHROMA_EMBEDDED_WRITER = os.getenv("CHROMA_EMBEDDED_WRITER", "false").lower() == "true"
+
+_embedding_fn = None
+_embedding_lock = threading.Lock()
+_shared_collection = None
+_shared_lock = threading.Lock()
+_http_client = None
+_http_lock = threading.Lock()
+_writer_handle = None
+_writer_lock = threading.Lock()
+
+
+class UnsafeWriteError(RuntimeError):
+    """Raised when a write would go to an embedded store that another process owns."""
+
+
+def get_embedding_function():
+    """Return a shared default embedding function so the model is only loaded once per process."""
+    global _embedding_fn
+    with _embedding_lock:
+        if _embedding_fn is None:
+            from chromadb.utils import embedding_functions
+            embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+            # The model is downloaded and loaded on first call; do it here, under the lock,
+            # so concurrent first users don't load it twice
+            embedding_fn(["warmup"])
+            _embedding_fn = embedding_fn
+    return _embedding_fn
+
+
+def normalize_embeddings(vectors):
+    """Return vectors scaled to unit length so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive inter-process lock on path, held for the duration of the block."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def check_writes_allowed(persist_directory=CHROMA_DB_DIR):
+    """
+    Make sure this process may write. Every process keeps its own in-memory index over an
+    embedded store, so only one process may ever write to it: the first to write takes an
+    exclusive lock on the persist directory and keeps it until it exits. Any other process
+    (another uvicorn/gunicorn worker, the ingestion CLI) gets UnsafeWriteError. A Chroma
+    server (CHROMA_MODE=http) accepts writes from every process.
+    """
+    global _writer_handle
+    if CHROMA_MODE == "http":
+        return
+
+    with _writer_lock:
+        if _writer_handle is not None:
+            return
+        abs_path = os.path.abspath(persist_directory)
+        if fcntl is None:
+            if CHROMA_EMBEDDED_WRITER:
+                return
+            raise UnsafeWriteError(
+                f"Cannot make sure this is the only process writing to the embedded ChromaDB store at {abs_path}. "
+                "Set CHROMA_MODE=http, or CHROMA_EMBEDDED_WRITER=true on the single process that writes."
+            )
+
+        os.makedirs(abs_path, exist_ok=True)
+        handle = open(os.path.join(abs_path, ".writer.lock"), "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.seek(0)
+            owner = handle.read().strip() or "unknown"
+            handle.close()
+            raise UnsafeWriteError(
+                f"Another process (pid {owner}) owns writes to the embedded ChromaDB store at {abs_path}. "
+                "Set CHROMA_MODE=http to share a Chroma server between processes, or write from that process."
+            )
+        handle.truncate(0)
+        handle.write(str(os.getpid()))
+        handle.flush()
+        # Held for the life of the process; the OS releases it on exit
+        _writer_handle = handle
+
+
+def write_lock(persist_directory=CHROMA_DB_DIR):
+    """Serializes writes, and centroid file updates, from every process sharing a persist directory."""
+    return file_lock(os.path.join(persist_directory, ".write.lock"))
+
+
+def _get_http_client():
+    """Return this process's HTTP client, with a keep-alive pool sized for concurrent requests."""
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+
+    from chromadb import HttpClient
+    from requests.adapters import HTTPAdapter
+
+    if CHROMA_AUTOSTART:
+        from app.chroma_server import ensure_chroma_server
+        ensure_chroma_server()
+
+    print(f"[ChromaDB] Using server: http://{CHROMA_HOST}:{CHROMA_PORT}")
+    client = HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    # chromadb keeps one requests.Session per client; widen its pool beyond the default 10
+    session = getattr(getattr(client, "_server", None), "_session", None)
+    if session is not None:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CHROMA_HTTP_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    _http_client = client
+    return client
+
 
 def get_chroma_client(persist_directory=CHROMA_DB_DIR):
     """Initialize and return a ChromaDB client."""
+    if CHROMA_MODE == "http":
+        with _http_lock:
+            return _get_http_client()
+
+    from chromadb import Client
+    from chromadb.config import Settings
+
     abs_path = os.path.abspath(persist_directory)
     print(f"[ChromaDB] Using persist_directory: {abs_path}")
     os.makedirs(abs_path, exist_ok=True)
@@ -23,22 +166,66 @@ def get_or_create_collection(client=None, name=COLLECTION_NAME):
         client = get_chroma_client()
         
     # Use default embedding function (sentence-transformers) - no API key required
-    embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+    embedding_fn = get_embedding_function()
 
     if name in [c.name for c in client.list_collections()]:
         return client.get_collection(name, embedding_function=embedding_fn)
     return client.create_collection(name, embedding_function=embedding_fn)
 
 
+def get_shared_collection():
+    """Return the process-wide default collection, opening it on first use."""
+    global _shared_collection
+    with _shared_lock:
+        if _shared_collection is None:
+            _shared_collection = get_or_create_collection()
+    return _shared_collection
+
+
+def _new_documents(collection, docs):
+    """Drop docs whose IDs the collection already stores; Chroma would skip them on add."""
+    if not docs:
+        return docs
+    existing = set(collection.get(ids=[doc["id"] for doc in docs], include=[])["ids"])
+    return [doc for doc in docs if doc["id"] not in existing]
+
+
 def add_documents_to_collection(docs, collection=None):
     """
     Store a batch of documents in ChromaDB. Each doc must have 'id', 'text', and 'metadata'.
+    Documents already in the collection are skipped. Returns the number of documents added.
+    Raises UnsafeWriteError when this process must not write (see check_writes_allowed).
     """
+    check_writes_allowed()
     if collection is None:
-        client = get_chroma_client()
-        collection = get_or_create_collection(client)
-    ids = [doc["id"] for doc in docs]
-    texts = [doc["text"] for doc in docs]
-    metadatas = [doc["metadata"] for doc in docs]
-    collection.add(ids=ids, documents=texts, metadatas=metadatas)
-    return len(ids) 
\ No newline at end of file
+        collection = get_shared_collection()
+    # Re-ingesting a subreddit returns mostly known posts; don't embed them again
+    docs = _new_documents(collection, docs)
+    if not docs:
+        return 0
+
+    # Embed once here so the same vectors feed both the collection and the subreddit router
+    vectors = get_embedding_function()([doc["text"] for doc in docs])
+    embeddings = {doc["id"]: vector for doc, vector in zip(docs, vectors)}
+
+    from app.router import ROUTER_ENABLED, get_router
+    # Through a Chroma server several processes write and all of them update the
+    # centroid file, so keep them from interleaving
+    with write_lock():
+        # Another writer may have stored some of these while we were embedding
+        docs = _new_documents(collection, docs)
+        if not docs:
+            return 0
+        ids = [doc["id"] for doc in docs]
+        metadatas = [doc["metadata"] for doc in docs]
+        vectors = [embeddings[doc_id] for doc_id in ids]
+        collection.add(ids=ids, documents=[doc["text"] for doc in docs], metadatas=metadatas, embeddings=vectors)
+        if ROUTER_ENABLED:
+            try:
+                router = get_router()
+                # Only new documents move the centroids, so re-ingestion doesn't skew them
+                router.update([m.get("subreddit", "unknown") for m in metadatas], vectors)
+                router.save()
+            except Exception as e:
+                print(f"[Router] Failed to update subreddit centroids: {str(e)}")
+    return len(ids)
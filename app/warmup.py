@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+# Taken at first import of this module, which app.main and app.py do before anything heavy
+PROCESS_START = time.perf_counter()
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Failed attempts are retried with exponential backoff; after the last one liveness fails
+# too, so the orchestrator restarts the container instead of leaving it unready forever
+WARMUP_MAX_ATTEMPTS = int(os.getenv("WARMUP_MAX_ATTEMPTS", "6"))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "2"))
+WARMUP_MAX_RETRY_SECONDS = 60.0
+
+_ready = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+_state = {"status": "starting", "timings": {}, "error": None, "startup_seconds": None}
+
+
+def _timed(name, fn):
+    start = time.perf_counter()
+    result = fn()
+    _state["timings"][name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _warm_up_once():
+    from app.vector_store import get_embedding_function, get_shared_collection
+    from app.router import get_router
+
+    _state["timings"] = {}
+    embedding = _timed("embedding_model", lambda: get_embedding_function()(["warmup query"]))
+    collection = _timed("collection", get_shared_collection)
+    _timed("router", get_router)
+    if collection.count() > 0:
+        _timed("dummy_query", lambda: collection.query(query_embeddings=embedding, n_results=1))
+
+
+def warm_up():
+    """
+    Load the embedding model, open the shared collection and run a dummy query
+    so the first real request doesn't pay for any of it.
+    """
+    delay = WARMUP_RETRY_SECONDS
+    for attempt in range(1, WARMUP_MAX_ATTEMPTS + 1):
+        _state["status"] = "warming_up"
+        try:
+            _warm_up_once()
+            break
+        except Exception as e:
+            _state["error"] = str(e)
+            if attempt == WARMUP_MAX_ATTEMPTS:
+                _state["status"] = "failed"
+                print(f"[Startup] Warmup failed after {attempt} attempts: {str(e)}")
+                return
+            _state["status"] = "retrying"
+            print(f"[Startup] Warmup attempt {attempt} failed, retrying in {delay:.1f}s: {str(e)}")
+            time.sleep(delay)
+            delay = min(delay * 2, WARMUP_MAX_RETRY_SECONDS)
+
+    _state["status"] = "ready"
+    _state["error"] = None
+    _state["startup_seconds"] = round(time.perf_counter() - PROCESS_START, 3)
+    _ready.set()
+    steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in _state["timings"].items())
+    print(f"[Startup] Ready in {_state['startup_seconds']:.2f}s since process start ({steps})")
+
+
+def start_warmup():
+    """Start warmup in a background thread once per process; liveness is served meanwhile."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    if not WARMUP_ENABLED:
+        _state["status"] = "ready"
+        _state["startup_seconds"] = round(time.perf_counter() - PROCESS_START, 3)
+        _ready.set()
+        return
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def is_live():
+    """False once warmup has given up, so liveness probes restart the process."""
+    return _state["status"] != "failed"
+
+
+def readiness():
+    """Snapshot of warmup progress for the readiness probe."""
+    return {
+        "status": _state["status"],
+        "startup_seconds": _state["startup_seconds"],
+        "timings": dict(_state["timings"]),
+        "error": _state["error"],
+    }
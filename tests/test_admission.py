@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.admission import AdmissionController, ProviderGate, RateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    bucket = TokenBucket(rate_per_second=0.5, capacity=2)
+    assert bucket.try_take() == 0.0
+    assert bucket.try_take() == 0.0
+    wait = bucket.try_take()
+    assert 0 < wait <= 2.0
+
+
+def test_rate_limiter_returns_429_with_retry_after():
+    limiter = RateLimiter(per_minute=6, burst=2)
+    limiter.check("client-a")
+    limiter.check("client-a")
+    with pytest.raises(HTTPException) as excinfo:
+        limiter.check("client-a")
+
+    assert excinfo.value.status_code == 429
+    assert int(excinfo.value.headers["Retry-After"]) >= 1
+    # Buckets are per client
+    limiter.check("client-b")
+
+
+def test_rate_limiter_disabled_with_zero_rate():
+    limiter = RateLimiter(per_minute=0, burst=1)
+    for _ in range(5):
+        limiter.check("client-a")
+
+
+async def hold(gate, entered, release):
+    async with gate.slot():
+        entered.set()
+        await release.wait()
+
+
+def test_provider_gate_rejects_when_queue_full():
+    async def scenario():
+        gate = ProviderGate("test", concurrency=1, max_waiting=0, wait_timeout=1)
+        entered, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.ensure_future(hold(gate, entered, release))
+        await entered.wait()
+        try:
+            with pytest.raises(HTTPException) as excinfo:
+                async with gate.slot():
+                    pass
+        finally:
+            release.set()
+            await holder
+        return excinfo.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert "queue full" in error.detail
+    assert int(error.headers["Retry-After"]) >= 1
+
+
+def test_provider_gate_rejects_after_wait_deadline():
+    async def scenario():
+        gate = ProviderGate("test", concurrency=1, max_waiting=4, wait_timeout=0.05)
+        entered, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.ensure_future(hold(gate, entered, release))
+        await entered.wait()
+        try:
+            with pytest.raises(HTTPException) as excinfo:
+                async with gate.slot():
+                    pass
+        finally:
+            release.set()
+            await holder
+        return gate, excinfo.value
+
+    gate, error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert "deadline" in error.detail
+    assert gate.waiting == 0
+    assert gate.in_flight == 0
+
+
+def test_provider_gate_admits_waiter_when_slot_frees():
+    async def scenario():
+        gate = ProviderGate("test", concurrency=1, max_waiting=4, wait_timeout=1)
+        entered, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.ensure_future(hold(gate, entered, release))
+        await entered.wait()
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        async with gate.slot():
+            admitted = gate.in_flight
+        await holder
+        return admitted
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_llm_slot_reports_degraded_when_saturated(monkeypatch):
+    monkeypatch.setenv("LLM_CONCURRENCY_CLAUDE", "1")
+
+    async def scenario():
+        controller = AdmissionController(degraded_mode=True)
+        gate = controller.gate("claude")
+        async with controller.llm_slot("claude") as first:
+            pass
+        entered, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.ensure_future(hold(gate, entered, release))
+        await entered.wait()
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        async with controller.llm_slot("claude") as second:
+            pass
+        await holder
+        return first, second
+
+    assert asyncio.run(scenario()) == (False, True)
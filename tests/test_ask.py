@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.admission import AdmissionController
+from app.llm import LLMUnavailableError
+
+DOCS = [{"id": "d1", "text": "Post: Use virtual environments.", "metadata": {"subreddit": "python"}}]
+
+
+class FailingLLM:
+    def __init__(self):
+        self.timeouts = []
+
+    def generate(self, query, docs, timeout=None):
+        self.timeouts.append(timeout)
+        raise LLMUnavailableError("Request timed out.")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "admission", AdmissionController())
+    monkeypatch.setattr(main, "retrieve_documents", lambda *args, **kwargs: DOCS)
+    llm = FailingLLM()
+    monkeypatch.setattr(main, "get_llm_service", lambda model: llm)
+    client = TestClient(main.app)
+    client.llm = llm
+    return client
+
+
+def test_fallback_runs_after_the_llm_slot_is_released(client, monkeypatch):
+    in_flight = []
+
+    def fake_extractive(query, docs):
+        in_flight.append(main.admission.gate("claude").in_flight)
+        return "- Use virtual environments. (r/python)", ["d1"]
+
+    monkeypatch.setattr(main, "extractive_answer", fake_extractive)
+    response = client.post("/ask", json={"query": "how do I manage python packages"})
+
+    assert response.status_code == 200
+    assert response.json()["mode"] == "extractive_fallback"
+    assert in_flight == [0]
+
+
+def test_admission_rejection_keeps_503(client, monkeypatch):
+    monkeypatch.setenv("LLM_CONCURRENCY_CLAUDE", "0")
+    gate = main.admission.gate("claude")
+    gate.max_waiting = 0
+
+    response = client.post("/ask", json={"query": "how do I manage python packages"})
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_retrieval_time_counts_against_the_llm_deadline(client, monkeypatch):
+    def slow_retrieve(*args, **kwargs):
+        time.sleep(0.2)
+        return DOCS
+
+    monkeypatch.setattr(main, "retrieve_documents", slow_retrieve)
+    monkeypatch.setattr(main, "extractive_answer", lambda query, docs: ("- fallback", ["d1"]))
+    monkeypatch.setattr("app.llm.LLM_DEADLINE_SECONDS", 1.0)
+    client.post("/ask", json={"query": "how do I manage python packages"})
+
+    [timeout] = client.llm.timeouts
+    assert 0.5 < timeout <= 0.8
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.coalescing import SingleFlight, normalize_query
+
+
+def test_normalize_query_ignores_case_and_whitespace():
+    assert normalize_query("  How do   I learn Python ") == "how do i learn python"
+
+
+def test_do_shares_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("key", compute) for _ in range(3)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert results == ["answer"] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 2, "in_flight": 0}
+
+
+def test_do_starts_fresh_after_completion_and_per_key():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        flight = SingleFlight("test")
+        first = await flight.do("a", compute)
+        second = await flight.do("a", compute)
+        other = await flight.do("b", compute)
+        return first, second, other
+
+    assert asyncio.run(scenario()) == (1, 2, 3)
+
+
+def test_do_survives_a_cancelled_caller():
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        follower = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "answer"
+
+
+def test_stream_replays_earlier_chunks_to_late_subscribers():
+    runs = []
+
+    async def produce():
+        runs.append(1)
+        for chunk in ["a", "b", "c"]:
+            await asyncio.sleep(0.02)
+            yield chunk
+
+    async def collect(flight, delay=0):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in flight.stream("key", produce)]
+
+    async def scenario():
+        flight = SingleFlight("test")
+        # The second subscriber joins after "a" has already been produced
+        return flight, await asyncio.gather(collect(flight), collect(flight, delay=0.03))
+
+    flight, results = asyncio.run(scenario())
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(runs) == 1
+    assert flight.stats()["coalesced"] == 1
+
+
+def test_stream_raises_producer_error_for_every_subscriber():
+    async def produce():
+        yield "a"
+        await asyncio.sleep(0.02)
+        raise RuntimeError("provider down")
+
+    async def collect(flight):
+        chunks = []
+        with pytest.raises(RuntimeError, match="provider down"):
+            async for chunk in flight.stream("key", produce):
+                chunks.append(chunk)
+        return chunks
+
+    async def scenario():
+        flight = SingleFlight("test")
+        return await asyncio.gather(collect(flight), collect(flight))
+
+    assert asyncio.run(scenario()) == [["a"], ["a"]]
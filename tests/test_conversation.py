@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import app.conversation as conversation
+from app.conversation import blend_with_context, retrieve_for_turn
+
+EMBEDDINGS = {
+    "how do i learn python programming": [1.0, 0.0, 0.0],
+    "why?": [0.0, 0.0, 1.0],
+    "best pasta recipes": [0.0, 1.0, 0.0],
+}
+
+
+def doc(doc_id, embedding):
+    return {"id": doc_id, "text": doc_id, "metadata": {}, "embedding": embedding}
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    calls = []
+
+    def fake_search(query, top_k=5, include_embeddings=False, query_embedding=None, **kwargs):
+        calls.append(("search", query, list(query_embedding)))
+        return [doc("fresh", [0.5, 0.0, 0.5])]
+
+    def fake_retrieve(query, top_k=5, query_embedding=None, enhance=True, **kwargs):
+        calls.append(("retrieve", query, list(query_embedding), enhance))
+        return [doc("python-guide", [1.0, 0.1, 0.0]), doc("pasta", [0.0, 1.0, 0.0])][:top_k]
+
+    monkeypatch.setattr(conversation, "get_embedding_function",
+                        lambda: lambda texts: [EMBEDDINGS[text] for text in texts])
+    monkeypatch.setattr(conversation, "search_similar_documents", fake_search)
+    monkeypatch.setattr(conversation, "retrieve_documents", fake_retrieve)
+    return calls
+
+
+def test_first_turn_runs_full_retrieval(searches):
+    docs, cache = retrieve_for_turn("how do i learn python programming", top_k=1)
+
+    assert [d["id"] for d in docs] == ["python-guide"]
+    assert cache["query_embedding"] == [1.0, 0.0, 0.0]
+    assert searches[0][0] == "retrieve" and searches[0][3] is True
+
+
+def test_short_followup_keeps_previous_context(searches):
+    _, cache = retrieve_for_turn("how do i learn python programming", top_k=1)
+    docs, next_cache = retrieve_for_turn("why?", previous=cache, top_k=2)
+
+    # "why?" scores low against the previous question, but the search still leans on it
+    kind, _, embedding, _ = searches[-1]
+    assert kind == "retrieve"
+    assert embedding[0] > 0
+    assert "python-guide" in [d["id"] for d in docs]
+    assert np.allclose(next_cache["query_embedding"], blend_with_context([0.0, 0.0, 1.0], cache))
+
+
+def test_close_followup_skips_enhancement(searches):
+    _, cache = retrieve_for_turn("how do i learn python programming", top_k=1)
+    docs, _ = retrieve_for_turn("how do i learn python programming", previous=cache, top_k=2)
+
+    assert searches[-1][0] == "search"
+    assert [d["id"] for d in docs] == ["python-guide", "fresh"]
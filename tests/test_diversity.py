@@ -0,0 +1,51 @@
+import numpy as np
+
+from app.diversity import diversify_documents, mmr_fetch_k, mmr_select
+
+QUERY = [1.0, 0.0, 0.0]
+# Two near-duplicates that match the query best, then a distinct, less relevant one
+CANDIDATES = [
+    [0.95, 0.30, 0.0],
+    [0.95, 0.31, 0.0],
+    [0.70, 0.0, 0.70],
+    [0.10, 0.99, 0.0],
+]
+
+
+def test_pure_relevance_order_at_lambda_one():
+    relevance = np.asarray(CANDIDATES) @ np.asarray(QUERY) / np.linalg.norm(CANDIDATES, axis=1)
+    expected = [int(i) for i in np.argsort(-relevance)]
+    assert mmr_select(QUERY, CANDIDATES, 4, lambda_mult=1.0) == expected
+
+
+def test_near_duplicates_are_suppressed():
+    selected = mmr_select(QUERY, CANDIDATES, 2, lambda_mult=0.5)
+    assert selected[0] in (0, 1)
+    assert selected[1] == 2
+
+
+def test_k_larger_than_candidates_returns_each_once():
+    selected = mmr_select(QUERY, CANDIDATES, 10)
+    assert sorted(selected) == [0, 1, 2, 3]
+
+
+def test_empty_input():
+    assert mmr_select(QUERY, [], 3) == []
+    assert mmr_select(QUERY, CANDIDATES, 0) == []
+    assert diversify_documents(QUERY, [], 3) == []
+
+
+def test_diversify_drops_docs_without_embeddings():
+    docs = [
+        {"id": "a", "embedding": CANDIDATES[0]},
+        {"id": "b"},
+        {"id": "c", "embedding": None},
+        {"id": "d", "embedding": CANDIDATES[2]},
+    ]
+    assert [doc["id"] for doc in diversify_documents(QUERY, docs, 5)] == ["a", "d"]
+
+
+def test_fetch_k_over_fetches_within_bounds():
+    assert mmr_fetch_k(5) == 20
+    assert mmr_fetch_k(50) == 100
+    assert mmr_fetch_k(200) == 200
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import app.extractive as extractive
+from app.extractive import extractive_answer, split_sentences
+
+
+class BagOfWordsEmbedding:
+    """Deterministic stand-in for the ONNX model: sentences sharing words are similar."""
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vector = np.zeros(64, dtype=np.float32)
+            for word in text.lower().replace(".", " ").split():
+                vector[sum(map(ord, word)) % 64] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(extractive, "get_embedding_function", lambda: BagOfWordsEmbedding())
+
+
+def test_split_sentences_drops_labels_stubs_and_questions():
+    text = (
+        "Title: What is the best way to learn Python?\n"
+        "Post: [No text content]\n"
+        "Top Comment 1: Build small projects every week. Read other people's code too! Thanks.\n"
+    )
+    assert split_sentences(text) == ["Build small projects every week.", "Read other people's code too!"]
+
+
+def test_extractive_answer_picks_relevant_sentences_with_sources():
+    docs = [
+        {"id": "d1", "metadata": {"subreddit": "python"},
+         "text": "Top Comment 1: Virtual environments keep python dependencies isolated. "
+                 "My cat sleeps all day long."},
+        {"id": "d2", "metadata": {"subreddit": "learnpython"},
+         "text": "Post: Use venv for python dependencies in every project."},
+    ]
+    answer, used_doc_ids = extractive_answer("how to isolate python dependencies", docs, max_sentences=2)
+
+    lines = answer.splitlines()[2:]
+    assert len(lines) == 2
+    assert "(r/python)" in answer and "(r/learnpython)" in answer
+    assert "cat" not in answer
+    assert sorted(used_doc_ids) == ["d1", "d2"]
+
+
+def test_extractive_answer_deduplicates_doc_ids():
+    docs = [{"id": "d1", "metadata": {},
+             "text": "Post: Python lists are ordered collections. Python dicts map keys to values."}]
+    answer, used_doc_ids = extractive_answer("python lists and dicts", docs, max_sentences=2)
+
+    assert used_doc_ids == ["d1"]
+    assert "(r/" not in answer
+
+
+def test_extractive_answer_without_candidates():
+    docs = [{"id": "d1", "metadata": {}, "text": "Title: Any tips?\nPost: [No text content]"}]
+    assert extractive_answer("tips", docs) == ("I don't have enough context to answer this question.", [])
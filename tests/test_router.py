@@ -0,0 +1,53 @@
+import numpy as np
+
+from app.router import SubredditRouter
+
+
+def axis(i, dim=6):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+def test_update_merges_close_vectors_and_splits_distant_ones(tmp_path):
+    router = SubredditRouter(path=str(tmp_path / "centroids.json"), max_centroids=2, split_similarity=0.5)
+    router.update(["python", "python", "python"], [axis(0), axis(0) + 0.1 * axis(1), axis(2)])
+
+    entry = router.centroids["python"]
+    assert entry["counts"] == [2, 1]
+
+
+def test_update_respects_max_centroids(tmp_path):
+    router = SubredditRouter(path=str(tmp_path / "centroids.json"), max_centroids=2, split_similarity=0.5)
+    router.update(["python"] * 3, [axis(0), axis(1), axis(2)])
+
+    assert len(router.centroids["python"]["sums"]) == 2
+    assert sum(router.centroids["python"]["counts"]) == 3
+
+
+def test_route_returns_closest_subreddits(tmp_path):
+    router = SubredditRouter(path=str(tmp_path / "centroids.json"))
+    router.update(["python", "cooking", "fitness", "music"], [axis(0), axis(1), axis(2), axis(3)])
+
+    query = axis(1) + 0.5 * axis(0)
+    assert router.route(query, top_n=2, min_similarity=0.1) == ["cooking", "python"]
+
+
+def test_route_skips_when_few_subreddits_or_low_similarity(tmp_path):
+    router = SubredditRouter(path=str(tmp_path / "centroids.json"))
+    router.update(["python", "cooking"], [axis(0), axis(1)])
+    # Routing to every known subreddit is no better than a full search
+    assert router.route(axis(0), top_n=2) is None
+
+    router.update(["fitness", "music"], [axis(2), axis(3)])
+    assert router.route(axis(5), top_n=2, min_similarity=0.25) is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "centroids.json")
+    router = SubredditRouter(path=path)
+    router.update(["python", "cooking"], [axis(0), axis(1)])
+    router.save()
+
+    loaded = SubredditRouter(path=path).load()
+    assert loaded.centroids == router.centroids
@@ -0,0 +1,81 @@
+import fcntl
+import os
+
+import numpy as np
+import pytest
+
+import app.router as router_module
+import app.vector_store as vector_store
+from app.router import SubredditRouter
+
+
+class CountingEmbedding:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, input):
+        self.texts.extend(input)
+        return [np.random.default_rng(sum(map(ord, text))).random(8).tolist() for text in input]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    import chromadb
+
+    embedding = CountingEmbedding()
+    router = SubredditRouter(path=str(tmp_path / "centroids.json"))
+    monkeypatch.setattr(vector_store, "_embedding_fn", embedding)
+    monkeypatch.setattr(vector_store, "check_writes_allowed", lambda: None)
+    monkeypatch.setattr(vector_store, "write_lock", lambda: vector_store.file_lock(str(tmp_path / ".write.lock")))
+    monkeypatch.setattr(router_module, "get_router", lambda: router)
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"test_{tmp_path.name}")
+    return collection, embedding, router
+
+
+def make_docs(*ids):
+    return [{"id": doc_id, "text": f"post {doc_id}", "metadata": {"subreddit": "python"}} for doc_id in ids]
+
+
+def test_reingestion_skips_known_documents(store):
+    collection, embedding, router = store
+    assert vector_store.add_documents_to_collection(make_docs("a", "b"), collection) == 2
+    assert vector_store.add_documents_to_collection(make_docs("a", "b", "c"), collection) == 1
+
+    assert collection.count() == 3
+    assert embedding.texts == ["post a", "post b", "post c"]
+    assert sum(router.centroids["python"]["counts"]) == 3
+
+
+@pytest.fixture
+def no_writer(monkeypatch):
+    monkeypatch.setattr(vector_store, "CHROMA_MODE", "embedded")
+    monkeypatch.setattr(vector_store, "_writer_handle", None)
+    yield
+    if vector_store._writer_handle is not None:
+        vector_store._writer_handle.close()
+
+
+def test_first_writer_takes_ownership(tmp_path, no_writer):
+    vector_store.check_writes_allowed(str(tmp_path))
+    vector_store.check_writes_allowed(str(tmp_path))
+
+    assert (tmp_path / ".writer.lock").read_text() == str(os.getpid())
+
+
+def test_writes_refused_while_another_process_owns_the_store(tmp_path, no_writer):
+    # flock locks belong to the open file, so a second handle stands in for another process
+    with open(tmp_path / ".writer.lock", "w") as other:
+        other.write("4242")
+        other.flush()
+        fcntl.flock(other, fcntl.LOCK_EX)
+        with pytest.raises(vector_store.UnsafeWriteError, match="pid 4242"):
+            vector_store.check_writes_allowed(str(tmp_path))
+
+    assert vector_store._writer_handle is None
+
+
+def test_http_mode_never_takes_the_lock(tmp_path, no_writer, monkeypatch):
+    monkeypatch.setattr(vector_store, "CHROMA_MODE", "http")
+    vector_store.check_writes_allowed(str(tmp_path))
+
+    assert not (tmp_path / ".writer.lock").exists()